@@ -1,17 +1,53 @@
-from flask import Flask, render_template, request, jsonify
+import os
+
+# gunicorn's gevent worker patches before loading the app; this is only for
+# other launchers, e.g. GEVENT=1 python app.py
+if os.environ.get('GEVENT'):
+    from gevent import monkey
+    monkey.patch_all()
+
+from flask import Flask, render_template, request, g, copy_current_request_context
 import socket
+import selectors
 import concurrent.futures
+import errno
+import time
+import ipaddress
+import select
+import struct
+import hmac
+import hashlib
+import random
+import sys
+import threading
 from datetime import datetime
 import sqlite3
-import json
+import orjson
 import requests
-import os
-from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from functools import lru_cache
+import re
+
+# resource is POSIX-only; it tells us how many sockets scans may hold open
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# scapy is optional; without it SYN scans fall back to the connect scan
+try:
+    from scapy.all import IP, TCP, sr
+except ImportError:
+    sr = None
 
 app = Flask(__name__)
 
-# Common important ports
-IMPORTANT_PORTS = [
+def ojsonify(obj, status=200):
+    """Serialize obj with orjson into a JSON response"""
+    return app.response_class(orjson.dumps(obj), status=status, mimetype='application/json')
+
+# Common important ports, kept in ascending order
+IMPORTANT_PORTS = (
     21,    # FTP
     22,    # SSH
     23,    # Telnet
@@ -30,54 +66,205 @@ IMPORTANT_PORTS = [
     5432,  # PostgreSQL
     8080,  # HTTP Alternate
     8443,  # HTTPS Alternate
-]
+)
+
+# Hostname part of a URL or bare domain: optional scheme and user info, then the host
+HOSTNAME_RE = re.compile(r'^(?:[a-z][a-z0-9+.-]*://|//)?(?:[^@/?#]*@)?([^:/?#@]+)', re.IGNORECASE)
+
+# How long a resolved hostname is reused before asking DNS again (seconds)
+DNS_CACHE_TTL = 300
+
+# How long hosting provider lookups are kept in the database (seconds)
+GEO_CACHE_TTL = 24 * 60 * 60
+
+# ip-api.com accepts at most 100 queries per batch request
+GEO_BATCH_SIZE = 100
+
+# First scan pass: most hosts answer with SYN-ACK or RST well within this (seconds)
+PROBE_TIMEOUT = 0.25
+
+# Second scan pass, only for ports that stayed silent during the probe (seconds)
+RETRY_TIMEOUT = 2.0
+
+# SYN scans of at least this many ports use the stateless raw-socket prober
+STATELESS_SCAN_THRESHOLD = 10000
+
+# Upper bound on targets accepted by a single /scan_bulk request
+MAX_BULK_URLS = 20
+
+# Page size for /history when the client does not ask for one, and the largest allowed
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 500
+
+# Shared HTTP session so repeated ip-api calls reuse keep-alive connections
+http_session = requests.Session()
+http_session.mount('http://', HTTPAdapter(pool_connections=10, pool_maxsize=10))
+
+DATABASE = 'port_scanner.db'
 
 # Initialize database
 def init_db():
-    conn = sqlite3.connect('port_scanner.db')
+    conn = sqlite3.connect(DATABASE)
     c = conn.cursor()
+    # WAL lets /history reads proceed while a scan is being written
+    c.execute('PRAGMA journal_mode=WAL')
+    # JSON columns hold orjson-encoded bytes that are embedded into responses as-is
     c.execute('''CREATE TABLE IF NOT EXISTS scans
                  (id INTEGER PRIMARY KEY AUTOINCREMENT,
                   url TEXT NOT NULL,
                   ip_address TEXT,
-                  hosting_provider TEXT,
+                  hosting_provider BLOB,
                   scan_type TEXT,
-                  open_ports TEXT,
-                  closed_ports TEXT,
+                  open_ports BLOB,
+                  closed_ports BLOB,
                   timestamp TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS geo_cache
+                 (ip TEXT PRIMARY KEY,
+                  data BLOB NOT NULL,
+                  ts INTEGER NOT NULL)''')
     conn.commit()
     conn.close()
 
 init_db()
 
+def get_db():
+    """Return the database connection for the current app context, opening it on first use"""
+    if 'db' not in g:
+        g.db = sqlite3.connect(DATABASE, check_same_thread=False)
+        g.db.execute('PRAGMA synchronous=NORMAL')
+        g.db.execute('PRAGMA temp_store=MEMORY')
+    return g.db
+
+@app.teardown_appcontext
+def close_db(e=None):
+    db = g.pop('db', None)
+    if db is not None:
+        db.close()
+
+def insert_scans_bulk(rows):
+    """Insert scan rows in a single transaction and return their ids in order"""
+    conn = get_db()
+    # Take the write lock up front so the ids handed out below are contiguous
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.executemany('''INSERT INTO scans 
+                            (url, ip_address, hosting_provider, scan_type, open_ports, closed_ports, timestamp)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)''', rows)
+        last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+    except:
+        conn.rollback()
+        raise
+    conn.commit()
+    return list(range(last_id - len(rows) + 1, last_id + 1))
+
+@lru_cache(maxsize=4096)
+def _resolve_hostname(hostname, ttl_bucket):
+    """Resolve a hostname; ttl_bucket changes every DNS_CACHE_TTL seconds to expire entries"""
+    # Scans are IPv4-only, so ask for A records alone and skip service-name lookup
+    infos = socket.getaddrinfo(hostname, None, socket.AF_INET, socket.SOCK_STREAM, 0,
+                               socket.AI_ADDRCONFIG | socket.AI_NUMERICSERV)
+    return infos[0][4][0]
+
 def get_ip_address(url):
     """Get IP address from URL"""
     try:
-        # Parse URL to get hostname
-        parsed = urlparse(url)
-        hostname = parsed.netloc if parsed.netloc else parsed.path
-        # Remove port if present
-        hostname = hostname.split(':')[0]
-        ip = socket.gethostbyname(hostname)
+        # Pull the hostname out of the URL, dropping scheme, credentials, port and path
+        match = HOSTNAME_RE.match(url.strip())
+        if not match:
+            return None
+        hostname = match.group(1)
+        ip = _resolve_hostname(hostname, int(time.monotonic() // DNS_CACHE_TTL))
         return ip
     except Exception as e:
         return None
 
-def get_hosting_provider(ip):
-    """Get hosting provider information"""
-    try:
-        response = requests.get(f'http://ip-api.com/json/{ip}', timeout=5)
+def _parse_provider(data):
+    """Extract the fields we keep from an ip-api.com answer"""
+    return {
+        'org': data.get('org', 'Unknown'),
+        'isp': data.get('isp', 'Unknown'),
+        'country': data.get('country', 'Unknown'),
+        'city': data.get('city', 'Unknown')
+    }
+
+def _fetch_providers(ips):
+    """Query ip-api.com for a chunk of IPs, returning the raw answers"""
+    # A single IP uses the plain endpoint, which has a higher rate limit than /batch
+    if len(ips) == 1:
+        response = http_session.get(f'http://ip-api.com/json/{ips[0]}', timeout=5)
         data = response.json()
-        if data['status'] == 'success':
-            return {
-                'org': data.get('org', 'Unknown'),
-                'isp': data.get('isp', 'Unknown'),
-                'country': data.get('country', 'Unknown'),
-                'city': data.get('city', 'Unknown')
-            }
+        data.setdefault('query', ips[0])
+        return [data]
+    response = http_session.post('http://ip-api.com/batch',
+                                 json=[{'query': ip} for ip in ips], timeout=5)
+    return response.json()
+
+def _is_private_ip(ip):
+    """Check whether ip is an address that ip-api.com cannot locate"""
+    try:
+        addr = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return addr.is_private or addr.is_loopback or addr.is_link_local or addr.is_reserved
+
+def get_hosting_providers_bulk(ips):
+    """Get hosting provider information for many IPs, batching cache misses"""
+    providers = {}
+    conn = get_db()
+    try:
+        c = conn.cursor()
+        now = time.time()
+        misses = []
+        for ip in dict.fromkeys(ips):
+            # Private and reserved addresses would only come back as failures
+            if _is_private_ip(ip):
+                providers[ip] = {'org': 'Private Network', 'isp': 'Private Network', 'country': 'N/A', 'city': 'N/A'}
+                continue
+            c.execute('SELECT data, ts FROM geo_cache WHERE ip = ?', (ip,))
+            row = c.fetchone()
+            if row and now - row[1] < GEO_CACHE_TTL:
+                providers[ip] = orjson.loads(row[0])
+            else:
+                misses.append(ip)
+        
+        for i in range(0, len(misses), GEO_BATCH_SIZE):
+            try:
+                answers = _fetch_providers(misses[i:i + GEO_BATCH_SIZE])
+            except:
+                continue
+            rows = []
+            for data in answers:
+                if data.get('status') == 'success':
+                    info = _parse_provider(data)
+                    providers[data['query']] = info
+                    rows.append((data['query'], orjson.dumps(info), int(now)))
+            c.executemany('INSERT OR REPLACE INTO geo_cache (ip, data, ts) VALUES (?, ?, ?)', rows)
+            conn.commit()
     except:
         pass
-    return {'org': 'Unknown', 'isp': 'Unknown', 'country': 'Unknown', 'city': 'Unknown'}
+    
+    for ip in ips:
+        providers.setdefault(ip, {'org': 'Unknown', 'isp': 'Unknown', 'country': 'Unknown', 'city': 'Unknown'})
+    return providers
+
+def run_in_background(func, *args):
+    """Run func in a thread of its own and return a Future for its result"""
+    # One thread per call (a greenlet under gevent), so lookups for concurrent
+    # requests never queue behind each other
+    future = concurrent.futures.Future()
+    
+    def run():
+        try:
+            future.set_result(func(*args))
+        except BaseException as e:
+            future.set_exception(e)
+    
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+def get_hosting_provider(ip):
+    """Get hosting provider information"""
+    return get_hosting_providers_bulk([ip])[ip]
 
 def scan_port(ip, port, timeout=3):
     """Scan a single port with improved detection"""
@@ -95,21 +282,250 @@ def scan_port(ip, port, timeout=3):
     except:
         return port, False
 
-def scan_ports(ip, ports, max_workers=20):
-    """Scan multiple ports concurrently"""
+def _max_open_sockets():
+    """How many sockets all running scans may hold open together"""
+    # Half the descriptor limit goes to scans; the rest stays free for client
+    # connections, the database and outgoing HTTP
+    if resource is None:
+        return 512
+    soft_limit = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+    if soft_limit == resource.RLIM_INFINITY:
+        return 16384
+    return max(64, min(soft_limit // 2, 16384))
+
+# Sockets shared by every scan in the process, and how many one scan takes at a time
+MAX_OPEN_SOCKETS = _max_open_sockets()
+SCAN_WINDOW = max(1, MAX_OPEN_SOCKETS // 4)
+
+_socket_budget = threading.Condition()
+_sockets_free = MAX_OPEN_SOCKETS
+
+def _acquire_sockets(count):
+    """Wait until count sockets are free in the process-wide budget and take them"""
+    global _sockets_free
+    with _socket_budget:
+        # Taking a whole window at once means no scan waits while holding part of the budget
+        _socket_budget.wait_for(lambda: _sockets_free >= count)
+        _sockets_free -= count
+
+def _release_sockets(count):
+    """Return sockets to the process-wide budget"""
+    global _sockets_free
+    with _socket_budget:
+        _sockets_free += count
+        _socket_budget.notify_all()
+
+def _scan_with_timeout(ip, ports, timeout):
+    """Probe ports concurrently using non-blocking sockets.
+    
+    Returns (open, closed, silent) where closed ports actively refused the
+    connection and silent ports gave no answer before the timeout.
+    """
     open_ports = []
     closed_ports = []
+    silent_ports = []
+    sel = selectors.DefaultSelector()
+    
+    # Fire off every connect at once; the kernel completes the handshakes in parallel
+    for port in ports:
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        except OSError:
+            # Out of descriptors: fail the scan rather than call the port closed
+            for key in list(sel.get_map().values()):
+                key.fileobj.close()
+            sel.close()
+            raise
+        try:
+            sock.setblocking(False)
+            result = sock.connect_ex((ip, port))
+        except:
+            result = -1
+        if result in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            sel.register(sock, selectors.EVENT_WRITE, port)
+        else:
+            sock.close()
+            closed_ports.append(port)
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_port = {executor.submit(scan_port, ip, port): port for port in ports}
-        for future in concurrent.futures.as_completed(future_to_port):
-            port, is_open = future.result()
-            if is_open:
-                open_ports.append(port)
+    # A socket becomes writable once its connect attempt has finished
+    deadline = time.monotonic() + timeout
+    while sel.get_map():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        for key, _ in sel.select(remaining):
+            sock = key.fileobj
+            if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                open_ports.append(key.data)
             else:
-                closed_ports.append(port)
+                closed_ports.append(key.data)
+            sel.unregister(sock)
+            sock.close()
+    
+    # Anything still pending at the deadline never answered
+    for key in list(sel.get_map().values()):
+        silent_ports.append(key.data)
+        sel.unregister(key.fileobj)
+        key.fileobj.close()
+    sel.close()
+    
+    return open_ports, closed_ports, silent_ports
+
+def _split_by_state(ports, open_set):
+    """Split ports into ascending open and closed lists"""
+    # The default port list is already sorted, so only custom lists need sorting
+    if ports is not IMPORTANT_PORTS:
+        ports = sorted(ports)
+    open_ports = [port for port in ports if port in open_set]
+    closed_ports = [port for port in ports if port not in open_set]
+    return open_ports, closed_ports
+
+def scan_ports(ip, ports, timeout=RETRY_TIMEOUT):
+    """Scan multiple ports concurrently in two passes"""
+    open_ports = []
+    for i in range(0, len(ports), SCAN_WINDOW):
+        window = ports[i:i + SCAN_WINDOW]
+        _acquire_sockets(len(window))
+        try:
+            # A short first pass settles every port that answers quickly
+            window_open, _, silent_ports = _scan_with_timeout(ip, window, PROBE_TIMEOUT)
+            open_ports += window_open
+            
+            # Only ports that stayed silent get the longer, second chance
+            if silent_ports:
+                open_ports += _scan_with_timeout(ip, silent_ports, timeout)[0]
+        finally:
+            _release_sockets(len(window))
+    
+    return _split_by_state(ports, set(open_ports))
+
+def syn_scan_available():
+    """SYN scanning needs scapy and root privileges for raw sockets"""
+    return sr is not None and hasattr(os, 'geteuid') and os.geteuid() == 0
+
+def scan_ports_syn(ip, ports, timeout=RETRY_TIMEOUT):
+    """Scan ports by sending bare SYNs and reading the replies, without completing handshakes"""
+    # Ports that cannot go into a TCP header are never probed and count as closed
+    valid_ports = [port for port in ports if isinstance(port, int) and 0 < port < 65536]
+    if not valid_ports:
+        return _split_by_state(ports, set())
+    answered, _ = sr(IP(dst=ip) / TCP(dport=valid_ports, flags='S'), timeout=timeout, verbose=0)
+    
+    # SYN-ACK means open; RST or no answer means closed or filtered
+    open_set = set()
+    for sent, received in answered:
+        if received.haslayer(TCP) and received[TCP].flags & 0x12 == 0x12:
+            open_set.add(sent[TCP].dport)
     
-    return sorted(open_ports), sorted(closed_ports)
+    return _split_by_state(ports, open_set)
+
+def stateless_scan_available():
+    """The stateless prober needs Linux raw sockets and root privileges"""
+    return sys.platform.startswith('linux') and os.geteuid() == 0
+
+def _checksum(data):
+    """Internet checksum (RFC 1071) of data"""
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+def _syn_cookie(secret, ip, port):
+    """Sequence number for a probe, so replies can be verified without remembering what was sent"""
+    digest = hmac.new(secret, f'{ip}:{port}'.encode(), hashlib.sha256).digest()
+    return int.from_bytes(digest[:4], 'big')
+
+def _build_syn(src_ip, dst_ip, src_port, dst_port, seq):
+    """Build a bare TCP SYN header; the kernel adds the IP header"""
+    header = struct.pack('!HHIIBBHHH', src_port, dst_port, seq, 0, 5 << 4, 0x02, 1024, 0, 0)
+    pseudo_header = struct.pack('!4s4sBBH', src_ip, dst_ip, 0, socket.IPPROTO_TCP, len(header))
+    checksum = _checksum(pseudo_header + header)
+    return header[:16] + struct.pack('!H', checksum) + header[18:]
+
+def scan_ports_stateless(ip, ports, timeout=RETRY_TIMEOUT):
+    """Masscan-style SYN scan from one raw socket, keeping no per-port state.
+    
+    Each probe's sequence number is a keyed hash of the target port, so a
+    SYN-ACK is accepted only if its acknowledgement number matches the hash
+    of the port it came from.
+    """
+    secret = os.urandom(16)
+    dst_ip = socket.inet_aton(ip)
+    
+    # Let the routing table pick the local address the probes will leave from
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.connect((ip, 9))
+        src_ip = socket.inet_aton(probe.getsockname()[0])
+    src_port = random.randint(40000, 60000)
+    
+    open_set = set()
+    
+    def drain(sock):
+        # Read every queued packet, keeping SYN-ACKs that answer one of our probes
+        while True:
+            try:
+                data = sock.recv(65535)
+            except BlockingIOError:
+                return
+            ihl = (data[0] & 0x0f) * 4
+            if data[12:16] != dst_ip or len(data) < ihl + 14:
+                continue
+            sport, dport, _, ack, _, flags = struct.unpack_from('!HHIIBB', data, ihl)
+            if (dport == src_port and flags & 0x12 == 0x12
+                    and (ack - 1) & 0xffffffff == _syn_cookie(secret, ip, sport)):
+                open_set.add(sport)
+    
+    sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        sock.setblocking(False)
+        
+        for i, port in enumerate(ports):
+            try:
+                packet = _build_syn(src_ip, dst_ip, src_port, port, _syn_cookie(secret, ip, port))
+            except (struct.error, TypeError):
+                continue
+            while True:
+                try:
+                    sock.sendto(packet, (ip, 0))
+                    break
+                except (BlockingIOError, InterruptedError):
+                    select.select([], [sock], [], 0.01)
+                except OSError as e:
+                    if e.errno != errno.ENOBUFS:
+                        raise
+                    time.sleep(0.001)
+            # Pick up early replies so the receive buffer never overflows
+            if i % 1000 == 999:
+                drain(sock)
+        
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select([sock], [], [], remaining)
+            if readable:
+                drain(sock)
+    finally:
+        sock.close()
+    
+    return _split_by_state(ports, open_set)
+
+def run_scan(ip, ports, scan_method='connect'):
+    """Scan ports with the requested method, falling back to a connect scan"""
+    if scan_method == 'syn':
+        try:
+            if len(ports) >= STATELESS_SCAN_THRESHOLD and stateless_scan_available():
+                return scan_ports_stateless(ip, ports)
+            if syn_scan_available():
+                return scan_ports_syn(ip, ports)
+        except OSError:
+            # e.g. root inside a container without CAP_NET_RAW
+            pass
+    return scan_ports(ip, ports)
 
 @app.route('/')
 def index():
@@ -122,14 +538,15 @@ def scan():
         url = data.get('url')
         scan_type = data.get('scan_type', 'default')
         custom_ports = data.get('custom_ports', [])
+        scan_method = data.get('scan_method', 'connect')
         
         # Get IP address
         ip = get_ip_address(url)
         if not ip:
-            return jsonify({'error': 'Unable to resolve IP address'}), 400
+            return ojsonify({'error': 'Unable to resolve IP address'}, 400)
         
-        # Get hosting provider
-        hosting_info = get_hosting_provider(ip)
+        # Get hosting provider while the scan runs
+        hosting_future = run_in_background(copy_current_request_context(get_hosting_provider), ip)
         
         # Determine ports to scan
         if scan_type == 'default':
@@ -138,22 +555,15 @@ def scan():
             ports_to_scan = custom_ports
         
         # Scan ports
-        open_ports, closed_ports = scan_ports(ip, ports_to_scan)
+        open_ports, closed_ports = run_scan(ip, ports_to_scan, scan_method)
+        hosting_info = hosting_future.result()
         
         # Save to database
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        conn = sqlite3.connect('port_scanner.db')
-        c = conn.cursor()
-        c.execute('''INSERT INTO scans 
-                     (url, ip_address, hosting_provider, scan_type, open_ports, closed_ports, timestamp)
-                     VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                  (url, ip, json.dumps(hosting_info), scan_type, 
-                   json.dumps(open_ports), json.dumps(closed_ports), timestamp))
-        scan_id = c.lastrowid
-        conn.commit()
-        conn.close()
+        scan_id, = insert_scans_bulk([(url, ip, orjson.dumps(hosting_info), scan_type,
+                                       orjson.dumps(open_ports), orjson.dumps(closed_ports), timestamp)])
         
-        return jsonify({
+        return ojsonify({
             'scan_id': scan_id,
             'url': url,
             'ip_address': ip,
@@ -164,74 +574,138 @@ def scan():
         })
     
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojsonify({'error': str(e)}, 500)
+
+@app.route('/scan_bulk', methods=['POST'])
+def scan_bulk():
+    try:
+        data = request.json
+        urls = data.get('urls', [])
+        scan_type = data.get('scan_type', 'default')
+        custom_ports = data.get('custom_ports', [])
+        scan_method = data.get('scan_method', 'connect')
+        
+        if not isinstance(urls, list) or not urls or not all(isinstance(url, str) for url in urls):
+            return ojsonify({'error': 'urls must be a non-empty list of strings'}, 400)
+        if len(urls) > MAX_BULK_URLS:
+            return ojsonify({'error': f'At most {MAX_BULK_URLS} URLs can be scanned at once'}, 400)
+        
+        # Determine ports to scan
+        if scan_type == 'default':
+            ports_to_scan = IMPORTANT_PORTS
+        else:
+            ports_to_scan = custom_ports
+        
+        # Resolve every target first so hosting info can be fetched in one batch
+        ips = {url: get_ip_address(url) for url in urls}
+        hosting_future = run_in_background(copy_current_request_context(get_hosting_providers_bulk),
+                                           [ip for ip in ips.values() if ip])
+        
+        results = []
+        scanned = []
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        for url in urls:
+            ip = ips[url]
+            if not ip:
+                results.append({'url': url, 'error': 'Unable to resolve IP address'})
+                continue
+            
+            open_ports, closed_ports = run_scan(ip, ports_to_scan, scan_method)
+            result = {
+                'url': url,
+                'ip_address': ip,
+                'hosting_provider': None,
+                'open_ports': open_ports,
+                'closed_ports': closed_ports,
+                'timestamp': timestamp
+            }
+            results.append(result)
+            scanned.append(result)
+        
+        hosting = hosting_future.result()
+        rows = []
+        for result in scanned:
+            result['hosting_provider'] = hosting[result['ip_address']]
+            rows.append((result['url'], result['ip_address'], orjson.dumps(result['hosting_provider']), scan_type,
+                         orjson.dumps(result['open_ports']), orjson.dumps(result['closed_ports']), timestamp))
+        
+        # Save every scan in one transaction once all scanning is done
+        for result, scan_id in zip(scanned, insert_scans_bulk(rows)):
+            result['scan_id'] = scan_id
+        
+        return ojsonify(results)
+    
+    except Exception as e:
+        return ojsonify({'error': str(e)}, 500)
 
 @app.route('/history', methods=['GET'])
 def get_history():
     try:
-        conn = sqlite3.connect('port_scanner.db')
+        # Keyset pagination: pass the last id seen as ?before= to get the next page
+        limit = request.args.get('limit', HISTORY_PAGE_SIZE, type=int)
+        limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+        before = request.args.get('before', type=int)
+        
+        conn = get_db()
         c = conn.cursor()
-        c.execute('SELECT * FROM scans ORDER BY timestamp DESC')
-        rows = c.fetchall()
-        conn.close()
-        
-        history = []
-        for row in rows:
-            history.append({
-                'id': row[0],
-                'url': row[1],
-                'ip_address': row[2],
-                'hosting_provider': json.loads(row[3]),
-                'scan_type': row[4],
-                'open_ports': json.loads(row[5]),
-                'closed_ports': json.loads(row[6]),
-                'timestamp': row[7]
-            })
-        
-        return jsonify(history)
+        c.arraysize = limit
+        c.execute('''SELECT id, url, ip_address, hosting_provider, scan_type, open_ports, closed_ports, timestamp
+                     FROM scans WHERE (? IS NULL OR id < ?) ORDER BY id DESC LIMIT ?''',
+                  (before, before, limit))
+        
+        history = [{
+            'id': row[0],
+            'url': row[1],
+            'ip_address': row[2],
+            'hosting_provider': orjson.Fragment(row[3]),
+            'scan_type': row[4],
+            'open_ports': orjson.Fragment(row[5]),
+            'closed_ports': orjson.Fragment(row[6]),
+            'timestamp': row[7]
+        } for row in c]
+        
+        return ojsonify(history)
     
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojsonify({'error': str(e)}, 500)
 
 @app.route('/history/<int:scan_id>', methods=['DELETE'])
 def delete_scan(scan_id):
     try:
-        conn = sqlite3.connect('port_scanner.db')
+        conn = get_db()
         c = conn.cursor()
         c.execute('DELETE FROM scans WHERE id = ?', (scan_id,))
         conn.commit()
-        conn.close()
         
-        return jsonify({'success': True})
+        return ojsonify({'success': True})
     
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojsonify({'error': str(e)}, 500)
 
 @app.route('/history/<int:scan_id>', methods=['GET'])
 def get_scan_details(scan_id):
     try:
-        conn = sqlite3.connect('port_scanner.db')
+        conn = get_db()
         c = conn.cursor()
         c.execute('SELECT * FROM scans WHERE id = ?', (scan_id,))
         row = c.fetchone()
-        conn.close()
         
         if not row:
-            return jsonify({'error': 'Scan not found'}), 404
+            return ojsonify({'error': 'Scan not found'}, 404)
         
-        return jsonify({
+        return ojsonify({
             'id': row[0],
             'url': row[1],
             'ip_address': row[2],
-            'hosting_provider': json.loads(row[3]),
+            'hosting_provider': orjson.Fragment(row[3]),
             'scan_type': row[4],
-            'open_ports': json.loads(row[5]),
-            'closed_ports': json.loads(row[6]),
+            'open_ports': orjson.Fragment(row[5]),
+            'closed_ports': orjson.Fragment(row[6]),
             'timestamp': row[7]
         })
     
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojsonify({'error': str(e)}, 500)
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,14 @@
+import os
+
+# Production server settings: gunicorn -c gunicorn_conf.py app:app
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Scans spend nearly all their time waiting on the network, so a single
+# worker serves many requests at once as gevent greenlets; raise
+# WEB_CONCURRENCY on instances with memory to spare
+worker_class = 'gevent'
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+worker_connections = 1000
+
+keepalive = 75
+timeout = 120
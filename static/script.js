@@ -222,16 +222,27 @@ function toggleHistory() {
     }
 }
 
-// Load scan history
-async function loadHistory() {
+// Number of scans fetched per history page
+const HISTORY_PAGE_SIZE = 50;
+
+// Load scan history, appending the page older than `before` when given
+async function loadHistory(before = null) {
     try {
-        const response = await fetch('/history');
+        const params = new URLSearchParams({ limit: HISTORY_PAGE_SIZE });
+        if (before !== null) {
+            params.set('before', before);
+        }
+        const response = await fetch(`/history?${params}`);
         const history = await response.json();
         
         const historyList = document.getElementById('historyList');
-        historyList.innerHTML = '';
+        if (before === null) {
+            historyList.innerHTML = '';
+        } else {
+            document.getElementById('loadMoreHistory')?.remove();
+        }
         
-        if (history.length === 0) {
+        if (history.length === 0 && before === null) {
             historyList.innerHTML = '<div style="text-align: center; padding: 3rem; color: var(--text-muted);">No scan history yet. Start scanning to see results here!</div>';
             return;
         }
@@ -279,6 +290,16 @@ async function loadHistory() {
             
             historyList.appendChild(historyItem);
         });
+        
+        // A full page means there may be older scans
+        if (history.length === HISTORY_PAGE_SIZE) {
+            const loadMore = document.createElement('button');
+            loadMore.id = 'loadMoreHistory';
+            loadMore.className = 'back-button load-more-button';
+            loadMore.textContent = 'Load more';
+            loadMore.addEventListener('click', () => loadHistory(history[history.length - 1].id));
+            historyList.appendChild(loadMore);
+        }
     } catch (error) {
         console.error('Error loading history:', error);
         alert('Failed to load scan history');